@@ -1,11 +1,74 @@
-import json
+import functools
+import io
+import itertools
+import logging
 import os
-import urllib.request
-import urllib.parse
-from typing import Any, Dict, List, Optional
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import orjson
+import urllib3
 from openai import OpenAI
 
 
+# Lambda installs a handler on the root logger, so this goes to CloudWatch
+_LOGGER = logging.getLogger()
+_LOGGER.setLevel(logging.INFO)
+
+# Workers for retrieving the prompt and changed pages in parallel, kept at
+# module scope so warm invocations don't start new threads
+_PAGE_WORKERS = 2
+_PAGE_EXECUTOR = ThreadPoolExecutor(max_workers=_PAGE_WORKERS)
+
+# Workers for posting the model's inline comments in parallel
+_COMMENT_WORKERS = 8
+_COMMENT_EXECUTOR = ThreadPoolExecutor(max_workers=_COMMENT_WORKERS)
+
+# Workers for fanning out per-block comment retrieval; this also bounds how
+# many concurrent requests a page render makes to Notion
+_FETCH_WORKERS = 16
+_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=_FETCH_WORKERS)
+
+# Module-level connection pool so warm Lambda invocations reuse keep-alive
+# connections to the Notion API instead of paying a TLS handshake per request.
+# It's bound to api.notion.com, so requests pass only the path. Every thread
+# that can make a Notion request (the executors above plus the handler's own)
+# gets a connection slot, so the pool never opens and discards a surplus one.
+# Requests time out rather than hang, so a stalled Notion call surfaces as an error.
+_NOTION = urllib3.HTTPSConnectionPool(
+    'api.notion.com',
+    maxsize=_PAGE_WORKERS + _COMMENT_WORKERS + _FETCH_WORKERS + 1,
+    timeout=urllib3.Timeout(connect=5, read=30),
+)
+
+# Blocks rendered per comment fan-out, matching Notion's maximum page size
+_RENDER_BATCH_SIZE = 100
+
+# Notion API request headers, built once from the environment on first use
+_NOTION_HEADERS: Optional[Dict[str, str]] = None
+
+# Lazily constructed OpenAI client, reused across warm invocations
+_OPENAI_CLIENT: Optional[OpenAI] = None
+
+# Prompt pages rarely change between webhooks, so warm containers keep
+# recently retrieved ones around, keyed by prompt_id
+_PROMPT_CACHE_TTL = float(os.environ.get('PROMPT_CACHE_TTL', '300'))
+_PROMPT_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+# Formatted blocks of recently retrieved pages, keyed by page_id and stored
+# with the page's last_edited_time so they're only reused while it's unchanged
+_RENDER_CACHE_SIZE = 32
+_RENDER_CACHE: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {}
+
+# Notion users keyed by user ID. Names and emails are effectively static, so
+# warm containers keep them for their whole lifetime.
+_USER_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
 def lambda_handler(event: Dict[str, Any], context: Dict[str, Any], debug: bool=False) -> str:
     """
     AWS Lambda handler for Notion webhook processing.
@@ -51,7 +114,7 @@ def lambda_handler(event: Dict[str, Any], context: Dict[str, Any], debug: bool=F
         changed_page_id = query_params.get('changed_id')
         if not changed_page_id:
             event_body = event.get('body', '')
-            request_data = json.loads(event_body).get('data')
+            request_data = orjson.loads(event_body).get('data')
             changed_page_id = request_data.get('id')
 
         inputs['changed_page_id'] = changed_page_id            
@@ -61,9 +124,19 @@ def lambda_handler(event: Dict[str, Any], context: Dict[str, Any], debug: bool=F
 
         print(inputs)
         if input_error:
-            return json.loads(inputs, indent=2)
+            return orjson.dumps(inputs, option=orjson.OPT_INDENT_2).decode()
+        
+        # Validate credentials before doing any work. Both are read from the
+        # environment once per container, so this is free on warm invocations.
+        _notion_headers()
+        _get_openai()
         
-        prompt_page = get_page(prompt_id)
+        # Prompt and changed pages are independent, so retrieve them concurrently
+        prompt_future = _PAGE_EXECUTOR.submit(get_prompt_page, prompt_id)
+        changed_future = _PAGE_EXECUTOR.submit(get_page, changed_page_id)
+        prompt_page = prompt_future.result()
+        changed_page = changed_future.result()
+
         prompt_name = prompt_page['name']
         print('retrieved prompt page', prompt_id)
 
@@ -71,7 +144,6 @@ def lambda_handler(event: Dict[str, Any], context: Dict[str, Any], debug: bool=F
             prompt_str = "# " + prompt_name + "\n\n" + prompt_page['markdown']
             open('prompt.txt', 'w').write(prompt_str)
         
-        changed_page = get_page(changed_page_id)
         changed_name = changed_page['name']
 
         print('retrieved changed page', changed_page_id)
@@ -97,11 +169,34 @@ def lambda_handler(event: Dict[str, Any], context: Dict[str, Any], debug: bool=F
             "openai_response": openai_response,
             "inputs": inputs,
         }
-        return json.dumps(result)
+        return orjson.dumps(result).decode()
         
     except Exception as e:
-        print(str(e))
-        return json.dumps({"error": str(e), 'event': event})
+        # Log the traceback and event rather than echoing the (possibly large)
+        # event back in the response
+        _LOGGER.exception("Error handling webhook")
+        _LOGGER.info("event=%s", event)
+        return orjson.dumps({"error": str(e), "request_id": getattr(context, 'aws_request_id', None)}).decode()
+
+
+def _notion_headers() -> Dict[str, str]:
+    """
+    Return the shared Notion API request headers, building them on first use.
+    
+    Returns:
+        Headers dictionary including the Notion authorization token
+    """
+    global _NOTION_HEADERS
+    if _NOTION_HEADERS is None:
+        notion_token = os.environ.get('NOTION_TOKEN')
+        if not notion_token:
+            raise ValueError("NOTION_TOKEN environment variable is required")
+        _NOTION_HEADERS = {
+            'Authorization': f'Bearer {notion_token}',
+            'Notion-Version': '2022-06-28',
+            'Content-Type': 'application/json'
+        }
+    return _NOTION_HEADERS
 
 
 def get_page(page_id: str) -> Dict[str, Any]:
@@ -114,143 +209,316 @@ def get_page(page_id: str) -> Dict[str, Any]:
     Returns:
         Dictionary containing page_id, title, and markdown content with block_ids
     """
-    notion_token = os.environ.get('NOTION_TOKEN')
-    if not notion_token:
-        raise ValueError("NOTION_TOKEN environment variable is required")
+    page_path = f"/v1/pages/{page_id}"
+    started_at = time.time()
+    cached = _RENDER_CACHE.get(page_id)
+    page_data = None
+    rendered = None
     
-    # Initialize user cache for this page retrieval
-    user_cache = {}
+    if cached:
+        # Check whether the page changed since it was last formatted
+        page_data = _parse_response(_NOTION.request('GET', page_path, headers=_notion_headers()))
+        if page_data.get('last_edited_time') == cached[0]:
+            rendered = cached[1]
     
-    # First, get the page metadata to extract the title
-    page_url = f"https://api.notion.com/v1/pages/{page_id}"
-    page_req = urllib.request.Request(
-        page_url,
-        headers={
-            'Authorization': f'Bearer {notion_token}',
-            'Notion-Version': '2022-06-28',
-            'Content-Type': 'application/json'
-        }
-    )
+    if rendered is None:
+        page_future = None
+        if page_data is None:
+            # The page metadata is only needed for the title, so retrieve it
+            # while the blocks are retrieved and formatted rather than before
+            page_future = _FETCH_EXECUTOR.submit(_NOTION.request, 'GET', page_path, headers=_notion_headers())
+        
+        rendered = list(_render_blocks(_iter_blocks(page_id)))
+        
+        if page_future is not None:
+            page_data = _parse_response(page_future.result())
+        _cache_rendered(page_id, page_data.get('last_edited_time'), started_at, rendered)
     
-    with urllib.request.urlopen(page_req) as response:
-        page_data = json.loads(response.read().decode())
+    # Comments don't change last_edited_time, so they are always retrieved fresh
+    markdown_content = _write_markdown(rendered)
     
     # Extract the title from properties
     page_title = extract_page_title(page_data.get('properties', {}))
     
-    # Now get the page blocks
-    blocks = []
-    start_cursor = None
-    has_more = True
+    return {
+        "page_id": page_id,
+        "name": page_title,
+        "markdown": markdown_content
+    }
+
+
+def _cache_rendered(page_id: str, last_edited_time: Optional[str], started_at: float, rendered: List[Tuple[str, str]]) -> None:
+    """
+    Store a page's formatted blocks for reuse while its last_edited_time is unchanged.
     
-    while has_more:
-        url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-        if start_cursor:
-            url += f"?start_cursor={start_cursor}"
-        
-        req = urllib.request.Request(
-            url,
-            headers={
-                'Authorization': f'Bearer {notion_token}',
-                'Notion-Version': '2022-06-28',
-                'Content-Type': 'application/json'
-            }
-        )
+    Notion rounds last_edited_time down to the minute, so a retrieval that started
+    within that minute could miss a later edit with the same timestamp. Those
+    retrievals are not cached.
+    
+    Args:
+        page_id: The Notion page ID
+        last_edited_time: The page's last_edited_time from its metadata
+        started_at: Epoch time when retrieval of the blocks started
+        rendered: (block_id, content) pairs from _render_blocks
+    """
+    if not last_edited_time:
+        return
+    
+    edited_at = datetime.fromisoformat(last_edited_time.replace('Z', '+00:00')).timestamp()
+    if started_at < edited_at + 60:
+        return
+    
+    if page_id not in _RENDER_CACHE and len(_RENDER_CACHE) >= _RENDER_CACHE_SIZE:
+        _RENDER_CACHE.pop(next(iter(_RENDER_CACHE)), None)
+    _RENDER_CACHE[page_id] = (last_edited_time, rendered)
+
 
-        with urllib.request.urlopen(req) as response:
-            data = json.loads(response.read().decode())
+def _iter_blocks(page_id: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the child blocks of a Notion page, prefetching the next page of results
+    while the current one is consumed.
+    
+    Args:
+        page_id: The Notion page ID whose blocks to retrieve
         
-        blocks.extend(data.get('results', []))
+    Yields:
+        Notion block objects in page order
+    """
+    data = _get_block_children(page_id, None)
+    
+    while True:
+        results = data.get('results', [])
         has_more = data.get('has_more', False)
         start_cursor = data.get('next_cursor')
+        # Only the results are needed, so release the rest of the response early
+        del data
+        
+        # Retrieve the next page while this one is being consumed
+        next_page = _FETCH_EXECUTOR.submit(_get_block_children, page_id, start_cursor) if has_more else None
+        
+        yield from results
+        
+        if next_page is None:
+            break
+        data = next_page.result()
+
 
-    markdown_content = notion_to_markdown(blocks, notion_token, user_cache)
+def _get_block_children(page_id: str, start_cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Retrieve one page of a Notion page's child blocks.
     
-    return {
-        "page_id": page_id,
-        "name": page_title,
-        "markdown": markdown_content
-    }
+    Args:
+        page_id: The Notion page ID whose blocks to retrieve
+        start_cursor: Cursor from the previous page, or None for the first page
+        
+    Returns:
+        Parsed Notion list response
+    """
+    # Request the maximum page size to minimize round trips
+    fields = {'page_size': '100'}
+    if start_cursor:
+        fields['start_cursor'] = start_cursor
+    
+    return _parse_response(_NOTION.request('GET', f"/v1/blocks/{page_id}/children", fields=fields, headers=_notion_headers()))
 
 
-def notion_to_markdown(blocks: List[Dict[str, Any]], notion_token: str, user_cache: Dict[str, Dict[str, Any]]) -> str:
+def get_prompt_page(prompt_id: str) -> Dict[str, Any]:
     """
-    Convert Notion blocks to Markdown format while preserving block IDs and including comments.
+    Retrieve a prompt page, reusing a cached copy while it is fresh.
     
     Args:
-        blocks: List of Notion block objects
-        notion_token: Notion API token for retrieving comments
-        user_cache: Dictionary to cache user information
+        prompt_id: The Notion page ID of the prompt
         
     Returns:
-        Markdown string with block_id annotations and comments
+        Page dictionary in the same format as get_page
+    """
+    now = time.monotonic()
+    cached = _PROMPT_CACHE.get(prompt_id)
+    if cached and now - cached[0] < _PROMPT_CACHE_TTL:
+        return cached[1]
+    
+    prompt_page = get_page(prompt_id)
+    _PROMPT_CACHE[prompt_id] = (now, prompt_page)
+    return prompt_page
+
+
+def _parse_response(response: urllib3.HTTPResponse) -> Dict[str, Any]:
+    """
+    Decode a JSON response from the Notion API.
+    
+    Args:
+        response: Response returned by the Notion connection pool
+        
+    Returns:
+        Parsed JSON body
+        
+    Raises:
+        urllib3.exceptions.HTTPError: If Notion returned a non-2xx status
+    """
+    if response.status >= 400:
+        raise urllib3.exceptions.HTTPError(f"HTTP {response.status}: {response.data.decode()}")
+    return orjson.loads(response.data)
+
+
+@dataclass(slots=True)
+class Block:
+    """The fields of a Notion block used when rendering it as Markdown."""
+    id: str
+    type: str
+    rich_text: List[Dict[str, Any]]
+    language: str = ''
+
+
+# Markdown heading prefixes indexed by heading level
+_HASHES = ['#' * level for level in range(7)]
+
+
+# Prefixes for block types rendered as a single Markdown line
+_LINE_PREFIXES = {
+    'paragraph': '',
+    'bulleted_list_item': '- ',
+    'numbered_list_item': '1. ',
+    'quote': '> ',
+}
+
+
+def _fmt_line(block: Block) -> Optional[str]:
+    """Format a single-line block with its _LINE_PREFIXES prefix, or return None if it has no content."""
+    content = _extract_rich_text(block.rich_text)
+    return f"{_LINE_PREFIXES[block.type]}{content}" if content.strip() else None
+
+
+def _fmt_heading(block: Block) -> Optional[str]:
+    """Format a heading_N block as a Markdown heading, or return None if it has no content."""
+    level = int(block.type.split('_')[1])
+    content = _extract_rich_text(block.rich_text)
+    return f"{_HASHES[level]} {content}" if content.strip() else None
+
+
+def _fmt_code(block: Block) -> Optional[str]:
+    """Format a code block as a fenced Markdown block, or return None if it has no content."""
+    content = _extract_rich_text(block.rich_text)
+    return f"```{block.language}\n{content}\n```" if content.strip() else None
+
+
+# Markdown formatters by block type, each returning None for empty blocks.
+# Headings have several types, so they are matched by prefix in _normalize_blocks.
+_HANDLERS: Dict[str, Callable[[Block], Optional[str]]] = {
+    **dict.fromkeys(_LINE_PREFIXES, _fmt_line),
+    'code': _fmt_code,
+}
+
+
+def _normalize_blocks(blocks: Iterable[Dict[str, Any]]) -> Iterator[Block]:
     """
-    markdown_lines = []
+    Flatten renderable Notion blocks into Block instances, skipping unsupported types.
     
+    Args:
+        blocks: Iterable of Notion block objects
+        
+    Yields:
+        Block for each block notion_to_markdown knows how to render
+    """
     for block in blocks:
-        block_id = block.get('id', '')
         block_type = block.get('type', '')
+        if block_type not in _HANDLERS and not block_type.startswith('heading_'):
+            continue
         
-        if block_type == 'paragraph':
-            content = _extract_rich_text(block.get('paragraph', {}).get('rich_text', []))
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(content)
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-        
-        elif block_type.startswith('heading_'):
-            level = int(block_type.split('_')[1])
-            content = _extract_rich_text(block.get(block_type, {}).get('rich_text', []))
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(f"{'#' * level} {content}")
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-        
-        elif block_type == 'bulleted_list_item':
-            content = _extract_rich_text(block.get('bulleted_list_item', {}).get('rich_text', []))
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(f"- {content}")
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-        
-        elif block_type == 'numbered_list_item':
-            content = _extract_rich_text(block.get('numbered_list_item', {}).get('rich_text', []))
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(f"1. {content}")
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-        
-        elif block_type == 'code':
-            code_block = block.get('code', {})
-            content = _extract_rich_text(code_block.get('rich_text', []))
-            language = code_block.get('language', '')
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(f"```{language}")
-                markdown_lines.append(content)
-                markdown_lines.append("```")
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-        
-        elif block_type == 'quote':
-            content = _extract_rich_text(block.get('quote', {}).get('rich_text', []))
-            if content.strip():
-                markdown_lines.append(f"block_id: {block_id}")
-                markdown_lines.append(f"> {content}")
-                # Add comments for this block
-                _add_block_comments(markdown_lines, block_id, notion_token, user_cache)
-                markdown_lines.append("")
-    
-    return "\n".join(markdown_lines).strip()
+        body = block.get(block_type) or {}
+        yield Block(
+            id=block.get('id', ''),
+            type=block_type,
+            rich_text=body.get('rich_text', []),
+            language=body.get('language', ''),
+        )
+
+
+def _render_blocks(blocks: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, str]]:
+    """
+    Format Notion blocks as Markdown, skipping blocks without content.
+    
+    Args:
+        blocks: Iterable of Notion block objects
+        
+    Yields:
+        (block_id, content) for each block with content
+    """
+    for block in _normalize_blocks(blocks):
+        content = _HANDLERS.get(block.type, _fmt_heading)(block)
+        if content is not None:
+            yield block.id, content
+
+
+def _write_markdown(rendered: Iterable[Tuple[str, str]]) -> str:
+    """
+    Join formatted blocks into Markdown, annotated with block IDs and comments.
+    
+    Args:
+        rendered: (block_id, content) pairs from _render_blocks
+        
+    Returns:
+        Markdown string with block_id annotations and comments
+    """
+    buf = io.StringIO()
+    rendered_iter = iter(rendered)
+    
+    # Comment authors resolved during this render. Fallbacks for transient
+    # lookup failures aren't kept in _USER_CACHE, so this is what stops one
+    # render from requesting the same user again for every comment.
+    users: Dict[str, Dict[str, Any]] = {}
+    
+    # Write in batches, retrieving each batch's comments concurrently. Empty
+    # blocks were already skipped, so they never cost a comment lookup.
+    while batch := list(itertools.islice(rendered_iter, _RENDER_BATCH_SIZE)):
+        comments_by_block = _fetch_block_comments([block_id for block_id, _ in batch])
+        _prefetch_users(comments_by_block, users)
+        
+        for block_id, content in batch:
+            # Each block, its comments and the blank separator line go out in one write
+            comments = _format_block_comments(comments_by_block[block_id], users)
+            buf.write(f"block_id: {block_id}\n{content}\n{comments}\n")
+    
+    return buf.getvalue().strip()
+
+
+def notion_to_markdown(blocks: Iterable[Dict[str, Any]]) -> str:
+    """
+    Convert Notion blocks to Markdown format while preserving block IDs and including comments.
+    
+    Args:
+        blocks: Iterable of Notion block objects, consumed once
+        
+    Returns:
+        Markdown string with block_id annotations and comments
+    """
+    return _write_markdown(_render_blocks(blocks))
+
+
+# Annotation bits used as keys into _WRAP
+_BOLD, _ITALIC, _STRIKETHROUGH, _CODE = 1, 2, 4, 8
+
+
+def _build_wraps() -> Dict[int, Tuple[str, str]]:
+    """
+    Build the Markdown prefix and suffix for every combination of rich text annotations.
+    
+    Returns:
+        Dictionary mapping an annotation bitmask to a (prefix, suffix) tuple
+    """
+    # Innermost mark first, matching the order annotations have always been applied
+    marks = (('**', _BOLD), ('*', _ITALIC), ('~~', _STRIKETHROUGH), ('`', _CODE))
+    wraps = {}
+    for flags in range(16):
+        prefix = suffix = ''
+        for mark, bit in marks:
+            if flags & bit:
+                prefix = mark + prefix
+                suffix = suffix + mark
+        wraps[flags] = (prefix, suffix)
+    return wraps
+
+
+_WRAP = _build_wraps()
 
 
 def _extract_rich_text(rich_text: List[Dict[str, Any]]) -> str:
@@ -263,22 +531,33 @@ def _extract_rich_text(rich_text: List[Dict[str, Any]]) -> str:
     Returns:
         Formatted markdown string
     """
+    # Blank lines in Notion are paragraph blocks with no rich text at all
+    if not rich_text:
+        return ''
+    
     result = []
     
     for text_obj in rich_text:
         content = text_obj.get('plain_text', '')
-        annotations = text_obj.get('annotations', {})
+        annotations = text_obj.get('annotations')
         href = text_obj.get('href')
         
+        flags = 0
+        if annotations:
+            flags = ((_BOLD if annotations.get('bold') else 0)
+                     | (_ITALIC if annotations.get('italic') else 0)
+                     | (_STRIKETHROUGH if annotations.get('strikethrough') else 0)
+                     | (_CODE if annotations.get('code') else 0))
+        
+        # Most runs are unformatted plain text
+        if not flags and not href:
+            result.append(content)
+            continue
+        
         # Apply formatting
-        if annotations.get('bold'):
-            content = f"**{content}**"
-        if annotations.get('italic'):
-            content = f"*{content}*"
-        if annotations.get('strikethrough'):
-            content = f"~~{content}~~"
-        if annotations.get('code'):
-            content = f"`{content}`"
+        if flags:
+            prefix, suffix = _WRAP[flags]
+            content = f"{prefix}{content}{suffix}"
         
         # Handle links
         if href:
@@ -289,83 +568,148 @@ def _extract_rich_text(rich_text: List[Dict[str, Any]]) -> str:
     return "".join(result)
 
 
-def get_user(user_id: str, notion_token: str, user_cache: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+class _CircuitBreaker:
+    """
+    Short-circuits calls to a dependency that keeps failing.
+    
+    After `threshold` failures within `window` seconds the breaker opens, and
+    allow() returns False for the next `cooldown` seconds so callers can fall
+    back immediately instead of waiting on requests that are likely to fail.
+    """
+    
+    def __init__(self, threshold: int, window: float, cooldown: float) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures = 0
+        self._first_failure_at = 0.0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Return whether a call should be attempted."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                self._opened_at = None
+                self._failures = 0
+                return True
+            return False
+    
+    def record_success(self) -> None:
+        """Record a call that reached the dependency successfully."""
+        with self._lock:
+            self._failures = 0
+    
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker once the threshold is hit."""
+        now = time.monotonic()
+        with self._lock:
+            if self._failures == 0 or now - self._first_failure_at > self.window:
+                self._failures = 0
+                self._first_failure_at = now
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = now
+
+
+# Opens after 5 failed user lookups within 10 seconds, for 30 seconds
+_USER_BREAKER = _CircuitBreaker(threshold=5, window=10, cooldown=30)
+
+# User lookups only decorate comments with a name, so they give up quickly
+# (one retry, for a dropped keep-alive connection) and count as a breaker
+# failure instead of holding up the render
+_USER_TIMEOUT = urllib3.Timeout(connect=2, read=5)
+_USER_RETRIES = 1
+
+
+def _unknown_user(user_id: str) -> Dict[str, Any]:
+    """Fallback user information for when a user can't be retrieved."""
+    return {
+        'name': 'Unknown User',
+        'email': '',
+        'id': user_id
+    }
+
+
+def get_user(user_id: str) -> Dict[str, Any]:
     """
     Retrieve user information from Notion API with caching.
     
     Args:
         user_id: The Notion user ID
-        notion_token: Notion API token
-        user_cache: Cache to store user information
         
     Returns:
         Dictionary with user information
     """
     # Check cache first
-    if user_id in user_cache:
-        return user_cache[user_id]
+    if user_id in _USER_CACHE:
+        return _USER_CACHE[user_id]
+    
+    # Skip the request while the users API is failing. Fallbacks for
+    # transient failures aren't cached, so the user is retried on a later render.
+    if not _USER_BREAKER.allow():
+        return _unknown_user(user_id)
     
     # Fetch from API
-    url = f"https://api.notion.com/v1/users/{user_id}"
-    req = urllib.request.Request(
-        url,
-        headers={
-            'Authorization': f'Bearer {notion_token}',
-            'Notion-Version': '2022-06-28'
-        }
-    )
+    try:
+        response = _NOTION.request(
+            'GET', f"/v1/users/{user_id}", headers=_notion_headers(),
+            timeout=_USER_TIMEOUT, retries=_USER_RETRIES,
+        )
+    except urllib3.exceptions.HTTPError:
+        # Connection errors and timeouts
+        _USER_BREAKER.record_failure()
+        return _unknown_user(user_id)
+    
+    if response.status >= 500 or response.status == 429:
+        _USER_BREAKER.record_failure()
+        return _unknown_user(user_id)
+    
+    # Notion answered, so other errors (e.g. a bot, or a user the integration
+    # can't see) are specific to this user and won't change on retry
+    _USER_BREAKER.record_success()
+    if response.status >= 400:
+        _USER_CACHE[user_id] = _unknown_user(user_id)
+        return _USER_CACHE[user_id]
     
     try:
-        with urllib.request.urlopen(req) as response:
-            user_data = json.loads(response.read().decode())
-        
-        # Extract relevant information
-        user_info = {
-            'name': user_data.get('name', 'Unknown User'),
-            'email': '',
-            'id': user_id
-        }
-        
-        # Get email if it's a person type user
-        if user_data.get('type') == 'person' and 'person' in user_data:
-            user_info['email'] = user_data['person'].get('email', '')
-        
-        # Cache the result
-        user_cache[user_id] = user_info
-        return user_info
-        
-    except urllib.error.HTTPError as e:
-        # If user API fails, return basic info
-        fallback_info = {
-            'name': 'Unknown User',
-            'email': '',
-            'id': user_id
-        }
-        user_cache[user_id] = fallback_info
-        return fallback_info
-    except Exception as e:
-        # For any other error, return basic info
-        fallback_info = {
-            'name': 'Unknown User',
-            'email': '',
-            'id': user_id
-        }
-        user_cache[user_id] = fallback_info
-        return fallback_info
+        user_data = orjson.loads(response.data)
+    except orjson.JSONDecodeError:
+        return _unknown_user(user_id)
+    
+    # Extract relevant information
+    user_info = {
+        'name': user_data.get('name', 'Unknown User'),
+        'email': '',
+        'id': user_id
+    }
+    
+    # Get email if it's a person type user
+    if user_data.get('type') == 'person' and 'person' in user_data:
+        user_info['email'] = user_data['person'].get('email', '')
+    
+    # Cache the result
+    _USER_CACHE[user_id] = user_info
+    return user_info
 
 
-def _add_block_comments(markdown_lines: List[str], block_id: str, notion_token: str, user_cache: Dict[str, Dict[str, Any]]) -> None:
+def _format_block_comments(comments: List[Dict[str, Any]], users: Dict[str, Dict[str, Any]]) -> str:
     """
-    Add comments for a specific block to the markdown lines.
+    Format the comments for a specific block as markdown lines.
     
     Args:
-        markdown_lines: List to append comment lines to
-        block_id: The block ID to get comments for
-        notion_token: Notion API token
-        user_cache: Cache for user information
+        comments: Comment objects already retrieved for the block
+        users: User information keyed by user ID, as filled in by _prefetch_users
+        
+    Returns:
+        Newline-terminated comment lines, or an empty string if there are none
     """
-    comments = get_block_comments(block_id, notion_token)
+    if not comments:
+        return ''
     
+    sections = []
     for comment in comments:
         comment_id = comment.get('id', '')
         comment_text = _extract_rich_text(comment.get('rich_text', []))
@@ -374,7 +718,7 @@ def _add_block_comments(markdown_lines: List[str], block_id: str, notion_token:
         
         # Get user information
         if user_id:
-            user_info = get_user(user_id, notion_token, user_cache)
+            user_info = users[user_id]
             user_name = user_info['name']
             user_email = user_info['email']
             
@@ -384,18 +728,57 @@ def _add_block_comments(markdown_lines: List[str], block_id: str, notion_token:
         else:
             comment_by = f'**Comment by Unknown User at {created_time}:**'
         
-        markdown_lines.append(f"comment block id: {comment_id}")
-        markdown_lines.append(comment_by)
-        markdown_lines.append(comment_text)
+        sections.append(f"comment block id: {comment_id}\n{comment_by}\n{comment_text}\n")
+    
+    return "".join(sections)
 
 
-def get_block_comments(block_id: str, notion_token: str) -> List[Dict[str, Any]]:
+def _fetch_block_comments(block_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Retrieve comments for many blocks concurrently.
+    
+    Args:
+        block_ids: The Notion block IDs to retrieve comments for
+        
+    Returns:
+        Dictionary mapping each block ID to its list of comment objects
+    """
+    comments = _FETCH_EXECUTOR.map(get_block_comments, block_ids)
+    return dict(zip(block_ids, comments))
+
+
+def _prefetch_users(comments_by_block: Dict[str, List[Dict[str, Any]]], users: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Resolve every comment author not yet in users, retrieving uncached ones concurrently.
+    
+    Args:
+        comments_by_block: Comment objects keyed by block ID
+        users: User information keyed by user ID, updated in place
+    """
+    user_ids = {
+        comment.get('created_by', {}).get('id', '')
+        for comments in comments_by_block.values()
+        for comment in comments
+    }
+    missing = []
+    for user_id in user_ids:
+        if not user_id or user_id in users:
+            continue
+        if user_id in _USER_CACHE:
+            users[user_id] = _USER_CACHE[user_id]
+        else:
+            missing.append(user_id)
+    
+    # Each author is requested at most once per render, even when the lookup fails
+    users.update(zip(missing, _FETCH_EXECUTOR.map(get_user, missing)))
+
+
+def get_block_comments(block_id: str) -> List[Dict[str, Any]]:
     """
     Retrieve all comments associated with a specific Notion block.
     
     Args:
         block_id: The Notion block ID
-        notion_token: The Notion API token
         
     Returns:
         List of comment objects
@@ -405,32 +788,20 @@ def get_block_comments(block_id: str, notion_token: str) -> List[Dict[str, Any]]
     has_more = True
     
     while has_more:
-        url = f"https://api.notion.com/v1/comments?block_id={block_id}"
+        fields = {'block_id': block_id}
         if start_cursor:
-            url += f"&start_cursor={start_cursor}"
+            fields['start_cursor'] = start_cursor
         
-        req = urllib.request.Request(
-            url,
-            headers={
-                'Authorization': f'Bearer {notion_token}',
-                'Notion-Version': '2022-06-28'
-            }
-        )
+        response = _NOTION.request('GET', '/v1/comments', fields=fields, headers=_notion_headers())
         
-        try:
-            with urllib.request.urlopen(req) as response:
-                data = json.loads(response.read().decode())
-            
-            comments.extend(data.get('results', []))
-            has_more = data.get('has_more', False)
-            start_cursor = data.get('next_cursor')
-            
-        except urllib.error.HTTPError as e:
-            # If comments API fails (e.g. permissions), return empty list
-            if e.code == 404 or e.code == 403:
-                break
-            else:
-                raise e
+        # If comments API fails (e.g. permissions), return empty list
+        if response.status == 404 or response.status == 403:
+            break
+        
+        data = _parse_response(response)
+        comments.extend(data.get('results', []))
+        has_more = data.get('has_more', False)
+        start_cursor = data.get('next_cursor')
     
     return comments
 
@@ -445,35 +816,47 @@ def extract_page_title(properties: Dict[str, Any]) -> str:
     Returns:
         Plain text title string
     """
-    # Look for the title property (usually has id "title" or type "title")
-    for prop_name, prop_data in properties.items():
+    # Every page has exactly one property of type "title", whatever its name
+    for prop_data in properties.values():
         if prop_data.get('type') == 'title':
-            title_array = prop_data.get('title', [])
+            title_array = prop_data.get('title')
             if title_array:
                 # Extract plain text from rich text objects
-                title_parts = []
-                for text_obj in title_array:
-                    title_parts.append(text_obj.get('plain_text', ''))
-                return ''.join(title_parts)
-    
-    # Fallback: look for a property named "Name" or "Title"
-    for prop_name in ['Name', 'Title', 'name', 'title']:
-        if prop_name in properties:
-            prop_data = properties[prop_name]
-            if prop_data.get('type') == 'title':
-                title_array = prop_data.get('title', [])
-                if title_array:
-                    title_parts = []
-                    for text_obj in title_array:
-                        title_parts.append(text_obj.get('plain_text', ''))
-                    return ''.join(title_parts)
-    
-    # Final fallback
+                return ''.join(text_obj.get('plain_text', '') for text_obj in title_array)
+    
+    # Fallback
     return 'Untitled'
 
 
 
 
+# Matches the opener of every Markdown block type markdown_to_notion understands.
+# The matched group number identifies the type: 2 heading, 3 code fence, or a
+# _LINE_BLOCK_TYPES entry.
+_BLOCK_RE = re.compile(r'(#+)[# ]*(.*)|```(.*)|- (.*)|[1-9]\. (.*)|> (.*)')
+_LINE_BLOCK_TYPES = {
+    4: 'bulleted_list_item',
+    5: 'numbered_list_item',
+    6: 'quote',
+}
+
+# First characters that can open a non-paragraph block. Other lines are
+# paragraphs and skip _BLOCK_RE entirely.
+_BLOCK_OPENERS = frozenset('#`->123456789')
+
+
+def _text_block(block_type: str, content: str) -> Dict[str, Any]:
+    """Build a Notion block of the given type holding a single plain text run."""
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {
+            "rich_text": [{"type": "text", "text": {"content": content}}],
+            "color": "default"
+        }
+    }
+
+
 def markdown_to_notion(markdown: str) -> List[Dict[str, Any]]:
     """
     Convert Markdown text to Notion blocks format.
@@ -495,22 +878,19 @@ def markdown_to_notion(markdown: str) -> List[Dict[str, Any]]:
             i += 1
             continue
         
+        match = _BLOCK_RE.match(line) if line[0] in _BLOCK_OPENERS else None
+        kind = match.lastindex if match else None
+        
         # Handle headers
-        if line.startswith('#'):
-            level = len(line) - len(line.lstrip('#'))
-            content = line.lstrip('# ').strip()
-            blocks.append({
-                "object": "block",
-                "type": f"heading_{level}",
-                f"heading_{level}": {
-                    "rich_text": [{"type": "text", "text": {"content": content}}],
-                    "color": "default"
-                }
-            })
+        if kind == 2:
+            # The match is anchored at the start of the line, so the end of
+            # the leading '#' run is the heading level
+            level = match.end(1)
+            blocks.append(_text_block(f"heading_{level}", match.group(2).lstrip()))
         
         # Handle code blocks
-        elif line.startswith('```'):
-            language = line[3:].strip()
+        elif kind == 3:
+            language = match.group(3).strip()
             code_lines = []
             i += 1
             while i < len(lines) and not lines[i].strip().startswith('```'):
@@ -526,77 +906,69 @@ def markdown_to_notion(markdown: str) -> List[Dict[str, Any]]:
                 }
             })
         
-        # Handle bullet points
-        elif line.startswith('- '):
-            content = line[2:].strip()
-            blocks.append({
-                "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": content}}],
-                    "color": "default"
-                }
-            })
-        
-        # Handle numbered lists
-        elif line.startswith(('1. ', '2. ', '3. ', '4. ', '5. ', '6. ', '7. ', '8. ', '9. ')):
-            content = line[3:].strip()
-            blocks.append({
-                "object": "block",
-                "type": "numbered_list_item",
-                "numbered_list_item": {
-                    "rich_text": [{"type": "text", "text": {"content": content}}],
-                    "color": "default"
-                }
-            })
-        
-        # Handle quotes
-        elif line.startswith('> '):
-            content = line[2:].strip()
-            blocks.append({
-                "object": "block",
-                "type": "quote",
-                "quote": {
-                    "rich_text": [{"type": "text", "text": {"content": content}}],
-                    "color": "default"
-                }
-            })
+        # Handle bullet points, numbered lists and quotes
+        elif kind is not None:
+            blocks.append(_text_block(_LINE_BLOCK_TYPES[kind], match.group(kind).lstrip()))
         
         # Handle regular paragraphs
         else:
-            blocks.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": line}}],
-                    "color": "default"
-                }
-            })
+            blocks.append(_text_block("paragraph", line))
         
         i += 1
     
     return blocks
 
 
-def notion_comment(block_id: str, comment_markdown: str, commenter_name: str) -> Dict[str, Any]:
+@functools.lru_cache(maxsize=256)
+def _markdown_to_notion_cached(markdown: str) -> Tuple[bytes, ...]:
+    """
+    Memoized markdown_to_notion for repeated comment text.
+    
+    Args:
+        markdown: Markdown string to convert
+        
+    Returns:
+        Tuple of JSON-serialized Notion blocks, immutable so it is safe to share
+    """
+    return tuple(orjson.dumps(block) for block in markdown_to_notion(markdown))
+
+
+def _custom_display_name(commenter_name: str) -> Dict[str, Any]:
+    """
+    Build the display_name for comments posted under a custom name.
+    
+    Args:
+        commenter_name: Name to show as the comment author
+        
+    Returns:
+        Notion display_name object
+    """
+    return {
+        "type": "custom",
+        "custom": {
+            "name": commenter_name
+        }
+    }
+
+
+def notion_comment(block_id: str, comment_markdown: str, commenter_name: str, display_name: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Add a comment to a specific block in Notion.
     
     Args:
         block_id: The ID of the block to comment on
         comment_markdown: The comment content in Markdown format
+        commenter_name: Name to post the comment under, if any
+        display_name: Pre-built display_name for commenter_name, to avoid
+            rebuilding it for every comment in an invocation
         
     Returns:
         Dictionary with comment creation result
     """
     print('notion_comment', block_id, comment_markdown)
     
-    notion_token = os.environ.get('NOTION_TOKEN')
-    if not notion_token:
-        raise ValueError("NOTION_TOKEN environment variable is required")
-    
     # Convert markdown to notion rich text format
-    comment_blocks = markdown_to_notion(comment_markdown)
+    comment_blocks = _markdown_to_notion_cached(comment_markdown)
     
     # Extract rich text from the first block (comments are single rich text arrays)
     if not comment_blocks:
@@ -612,40 +984,84 @@ def notion_comment(block_id: str, comment_markdown: str, commenter_name: str) ->
         },
         "rich_text": rich_text,
     }
-    if commenter_name:
-        comment_data['display_name'] = {
-            "type": "custom",
-            "custom": {
-                "name": commenter_name
-            }
-        }
+    if display_name is None and commenter_name:
+        display_name = _custom_display_name(commenter_name)
+    if display_name:
+        comment_data['display_name'] = display_name
     
     # Make API request
-    url = "https://api.notion.com/v1/comments"
-    req_data = json.dumps(comment_data).encode('utf-8')
-    
-    req = urllib.request.Request(
-        url,
-        data=req_data,
-        method='POST',
-        headers={
-            'Authorization': f'Bearer {notion_token}',
-            'Notion-Version': '2022-06-28',
-            'Content-Type': 'application/json'
-        }
-    )
+    req_data = orjson.dumps(comment_data)
     
     try:
-        with urllib.request.urlopen(req) as response:
-            result = json.loads(response.read().decode())
-            return {"success": True, "comment_id": result.get('id'), "result": result}
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        return {"success": False, "error": f"HTTP {e.code}: {error_body}"}
+        response = _NOTION.request('POST', '/v1/comments', body=req_data, headers=_notion_headers())
+        if response.status >= 400:
+            return {"success": False, "error": f"HTTP {response.status}: {response.data.decode()}"}
+        result = orjson.loads(response.data)
+        return {"success": True, "comment_id": result.get('id'), "result": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+# The notion_comment tool offered to OpenAI
+_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "notion_comment",
+            "description": "Add a comment to a specific block in the Notion document",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "block_id": {
+                        "type": "string",
+                        "description": "The ID of the block to comment on (found in the block_id lines in the document)"
+                    },
+                    "comment_markdown": {
+                        "type": "string", 
+                        "description": "The comment content in Markdown format"
+                    }
+                },
+                "required": ["block_id", "comment_markdown"]
+            }
+        }
+    }
+]
+
+
+def _call_notion_comment(tool_call: Any, commenter_name: str, display_name: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Execute a notion_comment tool call requested by the model.
+    
+    Args:
+        tool_call: Tool call from the OpenAI response message
+        commenter_name: Display name to post the comment under
+        display_name: Pre-built display_name for commenter_name
+        
+    Returns:
+        Dictionary with comment creation result
+    """
+    function_args = orjson.loads(tool_call.function.arguments)
+    block_id = function_args.get("block_id")
+    comment_markdown = function_args.get("comment_markdown")
+    return notion_comment(block_id, comment_markdown, commenter_name, display_name)
+
+
+def _get_openai() -> OpenAI:
+    """
+    Return the shared OpenAI client, constructing it on first use.
+    
+    Returns:
+        OpenAI client whose connection pool is reused across invocations
+    """
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        openai_api_key = os.environ.get('OPENAI_API_KEY')
+        if not openai_api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        _OPENAI_CLIENT = OpenAI(api_key=openai_api_key)
+    return _OPENAI_CLIENT
+
+
 def query_openai(system_prompt: str, user_prompt: str, model: str, page_id: str, commenter_name: str, include_page_comment: bool) -> str:
     """
     Query OpenAI API with system and user prompts, including function calling capability.
@@ -658,36 +1074,10 @@ def query_openai(system_prompt: str, user_prompt: str, model: str, page_id: str,
     Returns:
         OpenAI response text
     """
-    openai_api_key = os.environ.get('OPENAI_API_KEY')
-    if not openai_api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is required")
-    
-    client = OpenAI(api_key=openai_api_key)
-    
-    # Define the notion_comment tool for OpenAI
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "notion_comment",
-                "description": "Add a comment to a specific block in the Notion document",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "block_id": {
-                            "type": "string",
-                            "description": "The ID of the block to comment on (found in the block_id lines in the document)"
-                        },
-                        "comment_markdown": {
-                            "type": "string", 
-                            "description": "The comment content in Markdown format"
-                        }
-                    },
-                    "required": ["block_id", "comment_markdown"]
-                }
-            }
-        }
-    ]
+    client = _get_openai()
+    
+    # Every comment in this invocation is posted under the same name
+    display_name = _custom_display_name(commenter_name) if commenter_name else None
     
     try:
         messages = [
@@ -698,7 +1088,7 @@ def query_openai(system_prompt: str, user_prompt: str, model: str, page_id: str,
         response = client.chat.completions.create(
             model=model,
             messages=messages,
-            tools=tools,
+            tools=_TOOLS,
             tool_choice="auto"
         )
         
@@ -709,31 +1099,30 @@ def query_openai(system_prompt: str, user_prompt: str, model: str, page_id: str,
             # Process function calls
             messages.append(response_message)
             
-            for tool_call in response_message.tool_calls:
-                if tool_call.function.name == "notion_comment":
-                    # Parse function arguments
-                    function_args = json.loads(tool_call.function.arguments)
-                    block_id = function_args.get("block_id")
-                    comment_markdown = function_args.get("comment_markdown")
-                    
-                    # Call the notion_comment function
-                    comment_result = notion_comment(block_id, comment_markdown, commenter_name)
-                    
-                    # Add the function result to messages
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": "notion_comment",
-                        "content": json.dumps(comment_result)
-                    })
-            
-            # Get final response after function calls
-            final_response = client.chat.completions.create(
-                model=model,
-                messages=messages
+            # Comments are independent of each other, so post them concurrently
+            comment_calls = [tc for tc in response_message.tool_calls if tc.function.name == "notion_comment"]
+            comment_results = _COMMENT_EXECUTOR.map(
+                lambda tool_call: _call_notion_comment(tool_call, commenter_name, display_name),
+                comment_calls,
             )
+            
+            for tool_call, comment_result in zip(comment_calls, comment_results):
+                # Add the function result to messages
+                messages.append({
+                    "tool_call_id": tool_call.id,
+                    "role": "tool",
+                    "name": "notion_comment",
+                    "content": orjson.dumps(comment_result).decode()
+                })
+            
+            # The final response is only used for the page comment, so skip
+            # the second round trip to OpenAI when it won't be posted
             if include_page_comment:
-                notion_comment(page_id, final_response.choices[0].message.content, commenter_name)
+                final_response = client.chat.completions.create(
+                    model=model,
+                    messages=messages
+                )
+                notion_comment(page_id, final_response.choices[0].message.content, commenter_name, display_name)
 
         else:
             # No function calls, return regular response
@@ -746,7 +1135,7 @@ def query_openai(system_prompt: str, user_prompt: str, model: str, page_id: str,
 if __name__ == "__main__":
     with open('messages/automation_webhook.json', 'r') as fin:
         with open('test.json', 'r') as test_in:
-            test_envs = json.loads(test_in.read())
+            test_envs = orjson.loads(test_in.read())
         
         for key, val in test_envs.items():
             os.environ[key] = val